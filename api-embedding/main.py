@@ -1,17 +1,323 @@
+import asyncio
+import hashlib
 import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
 
+import orjson
 import torch
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from transformers import AutoModelForMaskedLM, AutoTokenizer
 
-from shared.models import EmbeddingRequest, EmbeddingResponse
+from shared.compression import ZstdRequestMiddleware
+from shared.models import (
+    EmbeddingBatchRequest,
+    EmbeddingBatchResponse,
+    EmbeddingRequest,
+    EmbeddingResponse,
+)
+from shared.openapi import json_request_body
+
+# Configuration
+MODEL_NAME = os.getenv("MODEL_NAME", "naver/splade_v2_distil")
+DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
+# Half precision halves weight bandwidth on Metal; CPU kernels stay in FP32
+DTYPE = torch.float16 if DEVICE == "mps" else torch.float32
+MAX_LENGTH = 512
+# Optional torch.compile of the encoder. Inputs are then padded up to a multiple
+# of SEQ_BUCKET tokens so the compiled graphs are reused across requests.
+COMPILE_MODEL = os.getenv("COMPILE_MODEL", "false").lower() == "true"
+SEQ_BUCKET = 128
+# Micro-batching: concurrent /embed calls arriving within MAX_BATCH_WAIT_MS are
+# coalesced into a single forward pass of at most MAX_BATCH_SIZE texts.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "10"))
+# Upper bound on padded tokens (batch size x longest sequence) per forward pass
+MAX_BATCH_TOKENS = int(os.getenv("MAX_BATCH_TOKENS", "8192"))
+# Number of recently computed vectors kept in memory (0 disables the cache)
+EMBED_CACHE_SIZE = int(os.getenv("EMBED_CACHE_SIZE", "4096"))
+
+# Loaded once per process by load_model() during the application lifespan
+tokenizer = None
+model = None
+
+
+def load_model() -> None:
+    """Loads the tokenizer and the SPLADE model onto the target device.
+
+    The service must run as a single process: every worker would hold its own
+    copy of the weights in unified memory and its own MPS graph caches.
+
+    Raises:
+        RuntimeError: If no fast (Rust) tokenizer is available for the model.
+    """
+    global tokenizer, model
+    print(f"Loading model {MODEL_NAME} to {DEVICE} ({DTYPE})...")
+    tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME, use_fast=True)
+    if not tokenizer.is_fast:
+        # The slow Python tokenizer would dominate CPU time on every batch
+        raise RuntimeError(
+            f"No fast tokenizer available for {MODEL_NAME}; "
+            "install the 'tokenizers' package or choose another model"
+        )
+    model = AutoModelForMaskedLM.from_pretrained(MODEL_NAME, dtype=DTYPE).to(DEVICE)
+    model.eval()
+    if COMPILE_MODEL:
+        model = torch.compile(model, dynamic=True)
+
+
+def split_by_token_budget(lengths: List[int], max_tokens: int) -> List[List[int]]:
+    """Groups sequence positions so that each padded group stays within budget.
+
+    Args:
+        lengths (List[int]): Token length of each sequence.
+        max_tokens (int): Maximum padded token count (rows x longest row) per group.
+
+    Returns:
+        List[List[int]]: Groups of indices into ``lengths``, each forming one batch.
+    """
+    groups: List[List[int]] = []
+    current: List[int] = []
+    longest = 0
+    # Sorting by length keeps similarly sized sequences together and minimizes padding
+    for idx in sorted(range(len(lengths)), key=lengths.__getitem__):
+        candidate = max(longest, lengths[idx])
+        if current and candidate * (len(current) + 1) > max_tokens:
+            groups.append(current)
+            current, candidate = [], lengths[idx]
+        current.append(idx)
+        longest = candidate
+    if current:
+        groups.append(current)
+    return groups
+
+
+def encode_batch(texts: List[str]) -> List[Dict[int, float]]:
+    """Runs the SPLADE encoder over a batch of texts.
+
+    Args:
+        texts (List[str]): Texts to vectorize.
+
+    Returns:
+        List[Dict[int, float]]: Sparse vector for each input text, in input order.
+    """
+    encoded = tokenizer(texts, truncation=True, max_length=MAX_LENGTH)
+    lengths = [len(ids) for ids in encoded["input_ids"]]
+    pad_multiple = SEQ_BUCKET if COMPILE_MODEL else None
+    if pad_multiple:
+        lengths = [-(-length // pad_multiple) * pad_multiple for length in lengths]
+    results: List[Optional[Dict[int, float]]] = [None] * len(texts)
+
+    for group in split_by_token_budget(lengths, MAX_BATCH_TOKENS):
+        inputs = tokenizer.pad(
+            {key: [encoded[key][i] for i in group] for key in encoded.keys()},
+            pad_to_multiple_of=pad_multiple,
+            return_tensors="pt",
+        ).to(DEVICE)
+
+        with torch.inference_mode():
+            outputs = model(**inputs)
+            # SPLADE logic: max over time of log(1 + relu(logits)), computed as a
+            # single [B, T, V] activation reduced straight into [B, V]
+            activated = torch.log1p(torch.relu(outputs.logits))
+            activated *= inputs.attention_mask.unsqueeze(-1).to(activated.dtype)
+            sparse_vectors = activated.amax(dim=1)
+
+            # Gather all non-zero weights of the batch in two bulk device transfers
+            # instead of one synchronizing .item() call per weight
+            rows, cols = sparse_vectors.nonzero(as_tuple=True)
+            weights = sparse_vectors[rows, cols].float().cpu().tolist()
+            rows, cols = rows.cpu().tolist(), cols.cpu().tolist()
+
+        vectors: List[Dict[int, float]] = [{} for _ in group]
+        for row, col, weight in zip(rows, cols, weights, strict=True):
+            vectors[row][col] = weight
+        for i, vector in zip(group, vectors, strict=True):
+            results[i] = vector
+
+    return results
+
+
+def warmup() -> None:
+    """Runs one forward pass per sequence-length bucket.
+
+    This triggers kernel selection (and graph compilation when ``COMPILE_MODEL``
+    is enabled) before the service accepts traffic.
+    """
+    for length in range(SEQ_BUCKET, MAX_LENGTH + 1, SEQ_BUCKET):
+        # Each "x" is a single token; two more are taken by [CLS] and [SEP]
+        encode_batch([" ".join(["x"] * (length - 2))])
+
+
+class VectorCache:
+    """In-memory LRU cache of sparse vectors keyed by a digest of the text.
+
+    Attributes:
+        maxsize (int): Maximum number of cached vectors.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[bytes, Dict[int, float]] = OrderedDict()
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+    def get(self, text: str) -> Optional[Dict[int, float]]:
+        """Returns the cached vector for a text, if any.
+
+        Args:
+            text (str): The source text.
+
+        Returns:
+            Optional[Dict[int, float]]: The cached vector, or None on a miss.
+        """
+        key = self._key(text)
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+        return vector
+
+    def put(self, text: str, vector: Dict[int, float]) -> None:
+        """Stores a vector, evicting the least recently used entry when full.
+
+        Args:
+            text (str): The source text.
+            vector (Dict[int, float]): The sparse vector of the text.
+        """
+        if self.maxsize <= 0:
+            return
+        key = self._key(text)
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent embedding requests into batched forward passes.
+
+    Requests are queued together with a future; a single background worker
+    drains the queue into batches and resolves each future with its vector.
+
+    Attributes:
+        max_batch_size (int): Maximum number of texts per batch.
+        max_wait (float): Seconds to wait for more requests after the first one.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float, cache: VectorCache):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._cache = cache
+        self._queue: asyncio.Queue[Tuple[str, asyncio.Future]] = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Starts the background batching worker."""
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the background batching worker."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def embed(self, text: str) -> Dict[int, float]:
+        """Queues a text for vectorization and waits for its result.
+
+        Args:
+            text (str): The text to vectorize.
+
+        Returns:
+            Dict[int, float]: The sparse vector of the text.
+        """
+        vector = self._cache.get(text)
+        if vector is not None:
+            return vector
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        vector = await future
+        self._cache.put(text, vector)
+        return vector
+
+    async def embed_many(self, texts: List[str]) -> List[Dict[int, float]]:
+        """Queues several texts for vectorization and waits for all results.
+
+        Args:
+            texts (List[str]): The texts to vectorize.
+
+        Returns:
+            List[Dict[int, float]]: The sparse vectors, in input order.
+        """
+        return list(await asyncio.gather(*(self.embed(text) for text in texts)))
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future]]:
+        """Waits for one request, then gathers more until the batch is full or stale."""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        """Processes batches until cancelled."""
+        while True:
+            batch = await self._collect()
+            # Skip requests whose callers have already gone away
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            try:
+                # Run the forward pass off the event loop so new requests keep queuing
+                vectors = await asyncio.to_thread(
+                    encode_batch, [text for text, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors, strict=True):
+                if not future.done():
+                    future.set_result(vector)
+
+
+batcher = EmbeddingBatcher(
+    MAX_BATCH_SIZE, MAX_BATCH_WAIT_MS, VectorCache(EMBED_CACHE_SIZE)
+)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """Lifecycle manager for the FastAPI application."""
+    await asyncio.to_thread(load_model)
+    print("Warming up model...")
+    await asyncio.to_thread(warmup)
+    batcher.start()
+    yield
+    await batcher.stop()
 
 # FastAPI App
 app = FastAPI(
     title="API Embedding Service",
     description="SPLADE-based sparse vector generation for Apple Silicon",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -23,16 +329,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configuration
-MODEL_NAME = os.getenv("MODEL_NAME", "naver/splade_v2_distil")
-DEVICE = "mps" if torch.backends.mps.is_available() else "cpu"
-
-print(f"Loading model {MODEL_NAME} to {DEVICE}...")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForMaskedLM.from_pretrained(MODEL_NAME).to(DEVICE)
-model.eval()
-
-# Helper classes removed as they are now imported from shared.models
+# Accept zstd-compressed request bodies from internal clients
+app.add_middleware(ZstdRequestMiddleware)
 
 @app.post("/embed", response_model=EmbeddingResponse, summary="Vectorize text")
 async def embed(request: EmbeddingRequest) -> EmbeddingResponse:
@@ -48,44 +346,95 @@ async def embed(request: EmbeddingRequest) -> EmbeddingResponse:
         HTTPException: If the vectorization process fails or the model errors.
     """
     try:
-        inputs = tokenizer(
-            request.text,
-            return_tensors="pt",
-            padding=True,
-            truncation=True,
-            max_length=512
-        ).to(DEVICE)
-        
-        with torch.no_grad():
-            outputs = model(**inputs)
-            # SPLADE logic: max over time of log(1 + relu(logits))
-            logits = outputs.logits
-            sparse_vector = torch.max(
-                torch.log(1 + torch.relu(logits)) * inputs.attention_mask.unsqueeze(-1),
-                dim=1
-            ).values.squeeze()
-
-        # Convert to dictionary of non-zero indices for efficiency
-        indices = torch.nonzero(sparse_vector).squeeze()
-        if indices.dim() == 0:
-            # Handle case where only 1 index is non-zero
-            values = {int(indices.item()): float(sparse_vector[indices].item())}
-        else:
-            values = {int(i): float(sparse_vector[i].item()) for i in indices}
-
+        values = await batcher.embed(request.text)
         return EmbeddingResponse(vector=values)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+@app.post(
+    "/embed_raw",
+    summary="Vectorize text without model validation",
+    openapi_extra=json_request_body(EmbeddingRequest),
+)
+async def embed_raw(request: Request) -> Response:
+    """Transforms input text into a SPLADE sparse vector on the hot path.
+
+    Accepts the same body as ``/embed`` and returns the same shape, but skips
+    Pydantic validation of both. Intended for trusted internal callers such as
+    api-search; external callers should use ``/embed``.
+
+    Args:
+        request (Request): Raw request whose JSON body is an ``EmbeddingRequest``.
+
+    Returns:
+        Response: JSON ``{"vector": {index: weight}}``.
+
+    Raises:
+        HTTPException: If the body is malformed or the vectorization fails.
+    """
+    try:
+        text = orjson.loads(await request.body())["text"]
+    except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid body: {e}") from e
+    if not isinstance(text, str):
+        raise HTTPException(
+            status_code=400, detail="Invalid body: text must be a string"
+        )
+    try:
+        values = await batcher.embed(text)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    return Response(
+        orjson.dumps({"vector": values}, option=orjson.OPT_NON_STR_KEYS),
+        media_type="application/json",
+    )
+
+@app.post(
+    "/embed_batch",
+    response_model=EmbeddingBatchResponse,
+    summary="Vectorize multiple texts"
+)
+async def embed_batch(request: EmbeddingBatchRequest) -> EmbeddingBatchResponse:
+    """Transforms several texts into SPLADE sparse vectors.
+
+    The texts share forward passes with each other and with concurrent
+    ``/embed`` calls, so one request replaces many round-trips.
+
+    Args:
+        request (EmbeddingBatchRequest): Request containing the texts to be vectorized.
+
+    Returns:
+        EmbeddingBatchResponse: Sparse vectors in the order of the input texts.
+
+    Raises:
+        HTTPException: If the vectorization process fails or the model errors.
+    """
+    try:
+        vectors = await batcher.embed_many(request.texts)
+        return EmbeddingBatchResponse(vectors=vectors)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
 @app.get("/health")
 async def health() -> dict:
     """Checks the health status of the embedding service.
 
+    The service is designed to run as a single worker process; scale out with
+    separate instances behind a load balancer rather than uvicorn workers.
+
     Returns:
-        dict: A dictionary containing the status, target device, and model name.
+        dict: A dictionary containing the status, target device, model dtype,
+            model name, and worker process ID.
     """
-    return {"status": "ok", "device": DEVICE, "model": MODEL_NAME}
+    return {
+        "status": "ok",
+        "device": DEVICE,
+        "dtype": str(DTYPE).removeprefix("torch."),
+        "model": MODEL_NAME,
+        "pid": os.getpid(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # Single worker: the model and its MPS graph caches live in this process
+    uvicorn.run(app, host="0.0.0.0", port=8001, workers=1)
@@ -0,0 +1,80 @@
+import asyncio
+
+import main
+import pytest
+
+
+@pytest.fixture
+def encode_calls(monkeypatch):
+    """Replaces the model forward pass; records the texts of each call."""
+    calls = []
+
+    def fake_encode_batch(texts):
+        calls.append(list(texts))
+        return [{len(text): 1.0} for text in texts]
+
+    monkeypatch.setattr(main, "encode_batch", fake_encode_batch)
+    return calls
+
+
+def run_with_batcher(scenario, max_wait_ms=20):
+    async def run():
+        batcher = main.EmbeddingBatcher(8, max_wait_ms, main.VectorCache(0))
+        batcher.start()
+        try:
+            return await scenario(batcher)
+        finally:
+            await batcher.stop()
+
+    return asyncio.run(run())
+
+
+def test_concurrent_requests_share_one_forward_pass(encode_calls):
+    async def scenario(batcher):
+        return await asyncio.gather(
+            batcher.embed("a"), batcher.embed("bb"), batcher.embed("ccc")
+        )
+
+    vectors = run_with_batcher(scenario)
+
+    assert encode_calls == [["a", "bb", "ccc"]]
+    # Each caller receives the vector of its own text
+    assert vectors == [{1: 1.0}, {2: 1.0}, {3: 1.0}]
+
+
+def test_embed_many_returns_vectors_in_input_order(encode_calls):
+    texts = ["ccc", "a", "bb", "dddd"]
+
+    vectors = run_with_batcher(lambda batcher: batcher.embed_many(texts))
+
+    assert vectors == [{len(text): 1.0} for text in texts]
+    assert encode_calls == [texts]
+
+
+def test_forward_pass_error_reaches_every_request(monkeypatch):
+    def failing_encode_batch(_texts):
+        raise RuntimeError("MPS out of memory")
+
+    monkeypatch.setattr(main, "encode_batch", failing_encode_batch)
+
+    async def scenario(batcher):
+        return await asyncio.gather(
+            batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+        )
+
+    results = run_with_batcher(scenario)
+
+    assert [str(result) for result in results] == ["MPS out of memory"] * 2
+
+
+def test_abandoned_requests_are_skipped(encode_calls):
+    async def scenario(batcher):
+        abandoned = asyncio.create_task(batcher.embed("gone"))
+        kept = asyncio.create_task(batcher.embed("kept"))
+        # Let both requests reach the queue, then drop one before the batch runs
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        return await kept
+
+    assert run_with_batcher(scenario, max_wait_ms=50) == {4: 1.0}
+    assert encode_calls == [["kept"]]
@@ -0,0 +1,29 @@
+from main import split_by_token_budget
+
+
+def test_split_by_token_budget_empty():
+    assert split_by_token_budget([], 100) == []
+
+
+def test_split_by_token_budget_single_group_when_within_budget():
+    groups = split_by_token_budget([10, 30, 20], 100)
+
+    # Indices are ordered by length to minimize padding
+    assert groups == [[0, 2, 1]]
+
+
+def test_split_by_token_budget_respects_padded_budget():
+    lengths = [5, 50, 12, 40, 8, 33, 21, 7]
+    max_tokens = 100
+
+    groups = split_by_token_budget(lengths, max_tokens)
+
+    assert sorted(i for group in groups for i in group) == list(range(len(lengths)))
+    for group in groups:
+        assert len(group) * max(lengths[i] for i in group) <= max_tokens
+
+
+def test_split_by_token_budget_oversized_sequence_gets_own_group():
+    groups = split_by_token_budget([10, 300, 10], 100)
+
+    assert groups == [[0, 2], [1]]
@@ -0,0 +1,54 @@
+import main
+import pytest
+from fastapi.testclient import TestClient
+
+
+class FakeBatcher:
+    """Returns a fixed vector for every text."""
+
+    def __init__(self):
+        self.texts = []
+
+    async def embed(self, text):
+        self.texts.append(text)
+        return {2054: 1.25, 7: 0.5}
+
+
+@pytest.fixture
+def fake_batcher(monkeypatch):
+    fake = FakeBatcher()
+    monkeypatch.setattr(main, "batcher", fake)
+    return fake
+
+
+@pytest.fixture
+def client():
+    return TestClient(main.app)
+
+
+def test_embed_raw_returns_vector_with_string_keys(client, fake_batcher):
+    resp = client.post("/embed_raw", json={"text": "hello"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"] == "application/json"
+    assert resp.json() == {"vector": {"2054": 1.25, "7": 0.5}}
+    assert fake_batcher.texts == ["hello"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"not json",
+        b'{"query": "hello"}',
+        b'["hello"]',
+        b'{"text": 42}',
+        b'{"text": null}',
+    ],
+)
+def test_embed_raw_rejects_malformed_bodies(client, fake_batcher, content):
+    resp = client.post(
+        "/embed_raw", content=content, headers={"content-type": "application/json"}
+    )
+
+    assert resp.status_code == 400
+    assert fake_batcher.texts == []
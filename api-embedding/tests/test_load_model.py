@@ -0,0 +1,25 @@
+import main
+import pytest
+
+
+class SlowTokenizer:
+    is_fast = False
+
+
+def test_load_model_requires_a_fast_tokenizer(monkeypatch):
+    # Restore the module globals that load_model assigns
+    monkeypatch.setattr(main, "tokenizer", None)
+    monkeypatch.setattr(main, "model", None)
+    monkeypatch.setattr(
+        main.AutoTokenizer, "from_pretrained", lambda *_args, **_kwargs: SlowTokenizer()
+    )
+
+    def unexpected_model_load(*_args, **_kwargs):
+        raise AssertionError("the model must not be loaded")
+
+    monkeypatch.setattr(
+        main.AutoModelForMaskedLM, "from_pretrained", unexpected_model_load
+    )
+
+    with pytest.raises(RuntimeError, match="No fast tokenizer"):
+        main.load_model()
@@ -0,0 +1,42 @@
+from main import VectorCache
+
+
+def test_get_returns_stored_vector():
+    cache = VectorCache(2)
+    cache.put("a", {1: 0.5})
+
+    assert cache.get("a") == {1: 0.5}
+    assert cache.get("b") is None
+
+
+def test_least_recently_used_entry_is_evicted_at_maxsize():
+    cache = VectorCache(2)
+    cache.put("a", {1: 1.0})
+    cache.put("b", {2: 1.0})
+    # Reading "a" makes "b" the least recently used entry
+    cache.get("a")
+
+    cache.put("c", {3: 1.0})
+
+    assert cache.get("a") == {1: 1.0}
+    assert cache.get("b") is None
+    assert cache.get("c") == {3: 1.0}
+
+
+def test_overwriting_refreshes_an_entry():
+    cache = VectorCache(2)
+    cache.put("a", {1: 1.0})
+    cache.put("b", {2: 1.0})
+    cache.put("a", {1: 2.0})
+
+    cache.put("c", {3: 1.0})
+
+    assert cache.get("a") == {1: 2.0}
+    assert cache.get("b") is None
+
+
+def test_maxsize_zero_disables_the_cache():
+    cache = VectorCache(0)
+    cache.put("a", {1: 1.0})
+
+    assert cache.get("a") is None
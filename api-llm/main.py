@@ -1,16 +1,38 @@
 import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, List, Optional, Tuple
 
 import httpx
+import orjson
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 from shared.models import LLMRequest, LLMResponse
 
+# Configuration
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+MODEL_NAME = os.getenv("MODEL_NAME", "gemma3:4b")
+# Fixed context window so every request hits the same loaded model instance
+NUM_CTX = int(os.getenv("NUM_CTX", "8192"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifecycle manager for the FastAPI application."""
+    # Shared HTTP client so Ollama calls reuse pooled keep-alive connections
+    app.state.http = httpx.AsyncClient(
+        timeout=60.0,
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+    )
+    yield
+    await app.state.http.aclose()
+
 # FastAPI App
 app = FastAPI(
     title="API LLM Service",
     description="RAG Prompt Engineering and Inference Engine for Gemma 3",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # CORS Middleware
@@ -22,11 +44,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Configuration
-OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
-MODEL_NAME = os.getenv("MODEL_NAME", "gemma3:4b")
+def build_prompt(request: LLMRequest) -> Tuple[str, List[str]]:
+    """Builds the RAG prompt and the list of sources for a request.
+
+    Args:
+        request (LLMRequest): User query and a list of contextually relevant chunks.
+
+    Returns:
+        Tuple[str, List[str]]: The prompt for the LLM and the unique source URLs.
+    """
+    # 1. Build context string
+    # Chunks are ordered by ID so that requests retrieving overlapping chunks
+    # share a token prefix, which Ollama can reuse from its KV cache
+    context_str = "".join(
+        f"--- Source {i+1}: {chunk.page_title} ---\n{chunk.content}\n\n"
+        for i, chunk in enumerate(sorted(request.context, key=lambda c: c.id))
+    )
+
+    # Unique source URLs, keeping the relevance order of the search results
+    sources = list(dict.fromkeys(chunk.url for chunk in request.context))
+
+    # 2. Build Prompt (the static instructions must stay byte-identical and first)
+    prompt = f"""あなたはScrapboxの知識ベースに基づくアシスタントです。
+以下の「提供されたコンテキスト」のみを使用して、ユーザーの質問に日本語で答えてください。
+コンテキストから答えが見つからない場合は、「わかりません」と答えてください。
+回答には、どのソースに基づいているかを明記する必要はありません（後でシステムが付与します）。
+
+### 提供されたコンテキスト:
+{context_str}
+
+### 質問:
+{request.query}
+
+### 回答:"""
+    return prompt, sources
+
+def ollama_payload(prompt: str, stream: bool) -> dict:
+    """Builds the request body for Ollama's generate API.
+
+    Args:
+        prompt (str): The prompt to complete.
+        stream (bool): Whether Ollama should stream the response.
+
+    Returns:
+        dict: JSON body for ``/api/generate``.
+    """
+    return {
+        "model": MODEL_NAME,
+        "prompt": prompt,
+        "stream": stream,
+        "options": {
+            "temperature": 0.1,
+            "num_ctx": NUM_CTX,
+        }
+    }
+
+def sse_event(data: Any, event: Optional[str] = None) -> bytes:
+    """Encodes a Server-Sent Event.
 
-# Helper classes removed as they are now imported from shared.models
+    Args:
+        data (Any): JSON-serializable event payload.
+        event (Optional[str]): Event name; omitted for default message events.
+
+    Returns:
+        bytes: The encoded event.
+    """
+    header = f"event: {event}\n".encode() if event else b""
+    return header + b"data: " + orjson.dumps(data) + b"\n\n"
 
 @app.post("/generate", response_model=LLMResponse)
 async def generate(request: LLMRequest) -> LLMResponse:
@@ -45,56 +129,79 @@ async def generate(request: LLMRequest) -> LLMResponse:
         HTTPException: If communication with Ollama fails or returns an error.
     """
     try:
-        # 1. Build context string
-        context_str = ""
-        sources = []
-        for i, chunk in enumerate(request.context):
-            line = f"--- Source {i+1}: {chunk.page_title} ---\n{chunk.content}\n\n"
-            context_str += line
-            if chunk.url not in sources:
-                sources.append(chunk.url)
-
-        # 2. Build Prompt
-        prompt = f"""あなたはScrapboxの知識ベースに基づくアシスタントです。
-以下の「提供されたコンテキスト」のみを使用して、ユーザーの質問に日本語で答えてください。
-コンテキストから答えが見つからない場合は、「わかりません」と答えてください。
-回答には、どのソースに基づいているかを明記する必要はありません（後でシステムが付与します）。
-
-### 提供されたコンテキスト:
-{context_str}
-
-### 質問:
-{request.query}
-
-### 回答:"""
+        prompt, sources = build_prompt(request)
 
         # 3. Call Ollama
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            resp = await client.post(
-                f"{OLLAMA_URL}/api/generate",
-                json={
-                    "model": MODEL_NAME,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                    }
-                }
+        resp = await app.state.http.post(
+            f"{OLLAMA_URL}/api/generate",
+            json=ollama_payload(prompt, stream=False)
+        )
+
+        if resp.status_code != 200:
+            raise HTTPException(
+                status_code=500, detail="Failed to communicate with Ollama"
             )
 
-            if resp.status_code != 200:
-                raise HTTPException(
-                    status_code=500, detail="Failed to communicate with Ollama"
-                )
+        answer = resp.json()["response"]
 
-            answer = resp.json()["response"]
-            
         return LLMResponse(answer=answer.strip(), sources=sources)
 
     except Exception as e:
         print(f"Error during LLM generation: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+@app.post("/generate_stream", summary="Generate an answer as a token stream")
+async def generate_stream(request: LLMRequest) -> StreamingResponse:
+    """Streams an answer based on the provided search context.
+
+    Same prompt as ``/generate``, but tokens are forwarded as Server-Sent
+    Events as soon as Ollama produces them. Each token is sent as a default
+    ``data: {"token": ...}`` event, followed by a final ``sources`` event
+    with the list of source URLs. Failures after the stream has started,
+    including errors reported by Ollama mid-stream, end the stream with an
+    ``error`` event instead of ``sources``.
+
+    Args:
+        request (LLMRequest): User query and a list of contextually relevant chunks.
+
+    Returns:
+        StreamingResponse: A ``text/event-stream`` response.
+    """
+    prompt, sources = build_prompt(request)
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async with app.state.http.stream(
+                "POST",
+                f"{OLLAMA_URL}/api/generate",
+                json=ollama_payload(prompt, stream=True)
+            ) as resp:
+                if resp.status_code != 200:
+                    yield sse_event(
+                        {"detail": "Failed to communicate with Ollama"}, "error"
+                    )
+                    return
+                async for line in resp.aiter_lines():
+                    if not line:
+                        continue
+                    part = orjson.loads(line)
+                    # Ollama reports failures mid-stream as {"error": ...} lines;
+                    # end without sources so the answer is not taken as complete
+                    if part.get("error"):
+                        print(f"Error during LLM streaming: {part['error']}")
+                        yield sse_event({"detail": part["error"]}, "error")
+                        return
+                    if part.get("response"):
+                        yield sse_event({"token": part["response"]})
+                    if part.get("done"):
+                        break
+            yield sse_event(sources, "sources")
+        except Exception as e:
+            print(f"Error during LLM streaming: {e}")
+            yield sse_event({"detail": str(e)}, "error")
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.get("/health")
 async def health() -> dict:
     """Checks service health and Ollama connectivity status.
@@ -103,10 +210,9 @@ async def health() -> dict:
         dict: Status of the service and Ollama connection state.
     """
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(f"{OLLAMA_URL}/api/tags")
-            status = "connected" if resp.status_code == 200 else "error"
-            return {"status": "ok", "ollama": status}
+        resp = await app.state.http.get(f"{OLLAMA_URL}/api/tags", timeout=5.0)
+        status = "connected" if resp.status_code == 200 else "error"
+        return {"status": "ok", "ollama": status}
     except Exception:
         return {"status": "ok", "ollama": "disconnected"}
 
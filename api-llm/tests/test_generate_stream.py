@@ -0,0 +1,65 @@
+import httpx
+import main
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+
+from shared.models import LLMRequest, ScrapboxChunk
+
+CHUNK = ScrapboxChunk(
+    id="page-1",
+    project_name="project",
+    page_title="Page",
+    content="Some context",
+    url="https://scrapbox.io/project/Page",
+    updated_at="2024-01-01T00:00:00",
+)
+
+
+@pytest.fixture
+def client_for():
+    """Returns a test client whose Ollama calls are answered by ``lines``."""
+    def make(lines):
+        def handler(_request: httpx.Request) -> httpx.Response:
+            body = b"".join(orjson.dumps(line) + b"\n" for line in lines)
+            return httpx.Response(200, content=body)
+
+        main.app.state.http = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler)
+        )
+        return TestClient(main.app)
+
+    return make
+
+
+def stream(client: TestClient) -> str:
+    request = LLMRequest(query="question", context=[CHUNK])
+    resp = client.post("/generate_stream", json=request.model_dump(mode="json"))
+    assert resp.status_code == 200
+    return resp.text
+
+
+def test_generate_stream_sends_tokens_then_sources(client_for):
+    client = client_for([
+        {"response": "He", "done": False},
+        {"response": "llo", "done": False},
+        {"response": "", "done": True},
+    ])
+
+    assert stream(client) == (
+        'data: {"token":"He"}\n\n'
+        'data: {"token":"llo"}\n\n'
+        'event: sources\ndata: ["https://scrapbox.io/project/Page"]\n\n'
+    )
+
+
+def test_generate_stream_reports_ollama_error_without_sources(client_for):
+    client = client_for([
+        {"response": "He", "done": False},
+        {"error": "model crashed"},
+    ])
+
+    assert stream(client) == (
+        'data: {"token":"He"}\n\n'
+        'event: error\ndata: {"detail":"model crashed"}\n\n'
+    )
@@ -1,19 +1,35 @@
-import os
 import asyncio
-from typing import Dict, List
+import hashlib
+import heapq
+import os
 from contextlib import asynccontextmanager
+from typing import Dict, List
 
 import httpx
-from fastapi import FastAPI, HTTPException
+import orjson
+from elasticsearch import AsyncElasticsearch
+from elasticsearch.helpers import async_bulk
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from elasticsearch import AsyncElasticsearch
-from shared.models import ScrapboxChunk, SearchQuery, SearchResultItem
+from shared.compression import ZstdRequestMiddleware
+from shared.models import (
+    BulkIndexRequest,
+    ScrapboxChunk,
+    SearchQuery,
+    SearchResultItem,
+)
+from shared.openapi import json_request_body
 
 # Configuration
 ES_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
 EMBEDDING_API_URL = os.getenv("EMBEDDING_API_URL", "http://localhost:8001")
 INDEX_NAME = os.getenv("INDEX_NAME", "scrapbox-chunks")
+# Only the highest-weighted SPLADE features are used as query clauses
+SPLADE_TOP_K = int(os.getenv("SPLADE_TOP_K", "128"))
+# Per-shard early termination (0 disables). Documents are collected in index
+# order, not by score, so this trades recall for latency.
+SEARCH_TERMINATE_AFTER = int(os.getenv("SEARCH_TERMINATE_AFTER", "0"))
 
 es = AsyncElasticsearch(
     ES_URL,
@@ -23,6 +39,11 @@ es = AsyncElasticsearch(
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifecycle manager for the FastAPI application."""
+    # Shared HTTP client so embedding lookups reuse pooled keep-alive connections
+    app.state.http = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=200, max_keepalive_connections=100)
+    )
+
     # Wait for ES to be truly ready (retry logic)
     for i in range(10):
         try:
@@ -63,6 +84,7 @@ async def lifespan(app: FastAPI):
         print(f"Index creation step failed: {e}")
     
     yield
+    await app.state.http.aclose()
     await es.close()
 
 # FastAPI App
@@ -82,6 +104,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Accept zstd-compressed request bodies from internal clients
+app.add_middleware(ZstdRequestMiddleware)
+
 @app.post("/search", response_model=List[SearchResultItem])
 async def search(request: SearchQuery) -> List[SearchResultItem]:
     """Performs a hybrid search combining BM25 and SPLADE sparse vectors.
@@ -97,15 +122,14 @@ async def search(request: SearchQuery) -> List[SearchResultItem]:
     """
     try:
         # 1. Get vector from api-embedding
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f"{EMBEDDING_API_URL}/embed",
-                json={"text": request.query},
-                timeout=10.0
-            )
-            if resp.status_code != 200:
-                raise HTTPException(status_code=500, detail="Failed to get embedding")
-            vector = resp.json()["vector"]
+        resp = await app.state.http.post(
+            f"{EMBEDDING_API_URL}/embed_raw",
+            json={"text": request.query},
+            timeout=10.0
+        )
+        if resp.status_code != 200:
+            raise HTTPException(status_code=500, detail="Failed to get embedding")
+        vector = resp.json()["vector"]
 
         # 2. Build multi-match + rank_feature query
         # Simplified hybrid search: linear combination via 'should'
@@ -113,6 +137,10 @@ async def search(request: SearchQuery) -> List[SearchResultItem]:
         # Correct rank_features query for multiple features:
         combined_query = {
             "size": request.top_k,
+            # The vector is only needed for scoring; don't ship it back per hit
+            "_source": {"excludes": ["vector"]},
+            # Totals are never displayed, so skip counting every match
+            "track_total_hits": False,
             "query": {
                 "bool": {
                     "should": [
@@ -127,8 +155,12 @@ async def search(request: SearchQuery) -> List[SearchResultItem]:
             },
         }
         
-        # Adding rank features
-        for feature_idx, weight in vector.items():
+        # Adding rank features (limit to top features for performance; the
+        # low-weight SPLADE tail contributes negligibly to the score)
+        top_features = heapq.nlargest(
+            SPLADE_TOP_K, vector.items(), key=lambda item: item[1]
+        )
+        for feature_idx, weight in top_features:
             combined_query["query"]["bool"]["should"].append({
                 "rank_feature": {
                     "field": f"vector.{feature_idx}",
@@ -136,15 +168,26 @@ async def search(request: SearchQuery) -> List[SearchResultItem]:
                 }
             })
 
-        response = await es.search(index=INDEX_NAME, body=combined_query)
+        if SEARCH_TERMINATE_AFTER > 0:
+            combined_query["terminate_after"] = max(
+                SEARCH_TERMINATE_AFTER, request.top_k
+            )
+
+        # The query is deterministic for a given text, so results can be served
+        # from the shard request cache. Routing identical queries to the same
+        # shard copies via a query-derived preference keeps that cache warm.
+        response = await es.search(
+            index=INDEX_NAME,
+            body=combined_query,
+            request_cache=True,
+            preference=hashlib.blake2b(
+                request.query.encode(), digest_size=8
+            ).hexdigest()
+        )
         
         results = []
         for hit in response["hits"]["hits"]:
             source = hit["_source"]
-            # Remove vector from output to save bandwidth
-            if "vector" in source:
-                del source["vector"]
-                
             results.append(SearchResultItem(
                 chunk=ScrapboxChunk(
                     id=hit["_id"],
@@ -180,12 +223,53 @@ async def index_chunk(chunk: ScrapboxChunk, vector: Dict[str, float]) -> dict:
     """
     try:
         body = chunk.model_dump(mode="json")
-        body["vector"] = {str(k): v for k, v in vector.items()}
+        body["vector"] = vector
         await es.index(index=INDEX_NAME, id=chunk.id, body=body)
         return {"result": "indexed", "id": chunk.id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+@app.post("/bulk_index", openapi_extra=json_request_body(BulkIndexRequest))
+async def bulk_index(request: Request) -> dict:
+    """Indexes many chunks with their vectors in a single bulk request.
+
+    The body follows the ``BulkIndexRequest`` schema. This endpoint is meant for
+    the trusted ingestion batch, so the body is decoded with orjson and passed
+    to Elasticsearch as-is instead of being re-validated document by document.
+
+    Args:
+        request (Request): Raw request whose JSON body is a ``BulkIndexRequest``.
+
+    Returns:
+        dict: A confirmation message with the number of indexed and failed documents.
+
+    Raises:
+        HTTPException: If the body is malformed or the bulk request to
+            Elasticsearch fails.
+    """
+    try:
+        items = orjson.loads(await request.body())["items"]
+        actions = [
+            {
+                "_op_type": "index",
+                "_index": INDEX_NAME,
+                "_id": item["chunk"]["id"],
+                "_source": {**item["chunk"], "vector": item["vector"]},
+            }
+            for item in items
+        ]
+    except (orjson.JSONDecodeError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid bulk body: {e}") from e
+    try:
+        indexed, errors = await async_bulk(
+            es, actions, chunk_size=500, refresh=False, raise_on_error=False
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+    if errors:
+        print(f"Bulk indexing failed for {len(errors)} documents: {errors[:3]}")
+    return {"result": "indexed", "indexed": indexed, "failed": len(errors)}
+
 @app.get("/health")
 async def health() -> dict:
     """Checks service health and Elasticsearch connectivity.
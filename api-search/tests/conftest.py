@@ -0,0 +1,33 @@
+import httpx
+import main
+import pytest
+from fakes import FakeBulk, FakeElasticsearch, embedding_api
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture
+def fake_es(monkeypatch):
+    """Replaces the Elasticsearch client with an in-memory fake."""
+    fake = FakeElasticsearch()
+    monkeypatch.setattr(main, "es", fake)
+    return fake
+
+
+@pytest.fixture
+def fake_bulk(monkeypatch):
+    """Replaces ``async_bulk`` with a recorder."""
+    fake = FakeBulk()
+    monkeypatch.setattr(main, "async_bulk", fake)
+    return fake
+
+
+@pytest.fixture
+def client_for():
+    """Returns a test client whose embedding lookups return the given vector."""
+    def make(vector):
+        main.app.state.http = httpx.AsyncClient(
+            transport=httpx.MockTransport(embedding_api(vector))
+        )
+        return TestClient(main.app)
+
+    return make
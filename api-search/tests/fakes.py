@@ -0,0 +1,38 @@
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+
+class FakeElasticsearch:
+    """Records search requests and answers them with canned hits."""
+
+    def __init__(self):
+        self.searches: List[Dict[str, Any]] = []
+        self.hits: List[Dict[str, Any]] = []
+
+    async def search(self, **kwargs: Any) -> Dict[str, Any]:
+        self.searches.append(kwargs)
+        return {"hits": {"hits": self.hits}}
+
+
+def embedding_api(
+    vector: Dict[str, float],
+) -> Callable[[httpx.Request], httpx.Response]:
+    """Builds a mock transport handler answering ``/embed_raw`` with ``vector``."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url.path == "/embed_raw"
+        return httpx.Response(200, json={"vector": vector})
+
+    return handler
+
+
+class FakeBulk:
+    """Stands in for ``async_bulk``; records actions and reports ``errors``."""
+
+    def __init__(self):
+        self.actions: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, Any]] = []
+
+    async def __call__(self, _client: Any, actions: List[Dict[str, Any]], **_kwargs):
+        self.actions.extend(actions)
+        return len(actions) - len(self.errors), self.errors
@@ -0,0 +1,88 @@
+import main
+import pytest
+
+CHUNK = {
+    "id": "p1_0",
+    "project_name": "project",
+    "page_title": "Page",
+    "content": "text",
+    "url": "https://scrapbox.io/project/Page",
+    "updated_at": "2024-01-01T00:00:00",
+    "indent_level": 0,
+}
+
+
+@pytest.fixture
+def client(client_for):
+    return client_for({})
+
+
+def test_bulk_index_builds_one_action_per_item(client, fake_bulk):
+    second = {**CHUNK, "id": "p1_1", "content": "more"}
+    body = {"items": [
+        {"chunk": CHUNK, "vector": {"10": 0.5}},
+        {"chunk": second, "vector": {"11": 1.5}},
+    ]}
+
+    resp = client.post("/bulk_index", json=body)
+
+    assert resp.status_code == 200
+    assert resp.json() == {"result": "indexed", "indexed": 2, "failed": 0}
+    assert fake_bulk.actions == [
+        {
+            "_op_type": "index",
+            "_index": main.INDEX_NAME,
+            "_id": "p1_0",
+            "_source": {**CHUNK, "vector": {"10": 0.5}},
+        },
+        {
+            "_op_type": "index",
+            "_index": main.INDEX_NAME,
+            "_id": "p1_1",
+            "_source": {**second, "vector": {"11": 1.5}},
+        },
+    ]
+
+
+def test_bulk_index_reports_failed_documents(client, fake_bulk):
+    fake_bulk.errors = [{"index": {"_id": "p1_0", "status": 400}}]
+
+    resp = client.post(
+        "/bulk_index", json={"items": [{"chunk": CHUNK, "vector": {"10": 0.5}}]}
+    )
+
+    assert resp.status_code == 200
+    assert resp.json() == {"result": "indexed", "indexed": 0, "failed": 1}
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        b"not json",
+        b'{"documents": []}',
+        b'{"items": [{"chunk": {"content": "no id"}, "vector": {}}]}',
+        b'{"items": [{"vector": {}}]}',
+        b'{"items": [{"chunk": "not an object", "vector": {}}]}',
+    ],
+)
+def test_bulk_index_rejects_malformed_bodies(client, fake_bulk, content):
+    resp = client.post(
+        "/bulk_index", content=content, headers={"content-type": "application/json"}
+    )
+
+    assert resp.status_code == 400
+    assert fake_bulk.actions == []
+
+
+def test_bulk_index_returns_500_when_elasticsearch_fails(client, monkeypatch):
+    async def failing_bulk(*_args, **_kwargs):
+        raise ConnectionError("cluster unavailable")
+
+    monkeypatch.setattr(main, "async_bulk", failing_bulk)
+
+    resp = client.post(
+        "/bulk_index", json={"items": [{"chunk": CHUNK, "vector": {"10": 0.5}}]}
+    )
+
+    assert resp.status_code == 500
+    assert resp.json() == {"detail": "cluster unavailable"}
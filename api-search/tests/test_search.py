@@ -0,0 +1,81 @@
+import main
+
+CHUNK_SOURCE = {
+    "project_name": "project",
+    "page_title": "Page",
+    "content": "text",
+    "url": "https://scrapbox.io/project/Page",
+    "updated_at": "2024-01-01T00:00:00",
+    "indent_level": 0,
+}
+
+
+def rank_feature_clauses(body):
+    return [
+        clause["rank_feature"]
+        for clause in body["query"]["bool"]["should"]
+        if "rank_feature" in clause
+    ]
+
+
+def test_search_uses_only_the_top_k_features(fake_es, client_for, monkeypatch):
+    monkeypatch.setattr(main, "SPLADE_TOP_K", 3)
+    vector = {"10": 0.1, "11": 0.9, "12": 0.5, "13": 0.05, "14": 0.7}
+
+    resp = client_for(vector).post("/search", json={"query": "hello", "top_k": 5})
+
+    assert resp.status_code == 200
+    clauses = rank_feature_clauses(fake_es.searches[0]["body"])
+    assert sorted(clauses, key=lambda clause: -clause["boost"]) == [
+        {"field": "vector.11", "boost": 0.9},
+        {"field": "vector.14", "boost": 0.7},
+        {"field": "vector.12", "boost": 0.5},
+    ]
+
+
+def test_search_keeps_bm25_clause_and_short_vectors(fake_es, client_for):
+    client_for({"7": 1.5}).post("/search", json={"query": "hello", "top_k": 5})
+
+    should = fake_es.searches[0]["body"]["query"]["bool"]["should"]
+    assert should[0] == {
+        "multi_match": {"query": "hello", "fields": ["content", "page_title"]}
+    }
+    assert rank_feature_clauses(fake_es.searches[0]["body"]) == [
+        {"field": "vector.7", "boost": 1.5}
+    ]
+
+
+def test_search_request_options(fake_es, client_for):
+    client = client_for({"7": 1.0})
+    client.post("/search", json={"query": "hello", "top_k": 5})
+    client.post("/search", json={"query": "hello", "top_k": 5})
+
+    first, second = fake_es.searches
+    body = first["body"]
+    assert body["size"] == 5
+    assert body["_source"] == {"excludes": ["vector"]}
+    assert body["track_total_hits"] is False
+    assert "terminate_after" not in body
+    assert first["request_cache"] is True
+    # Identical queries are routed to the same shard copies
+    assert first["preference"] == second["preference"]
+
+
+def test_search_sets_terminate_after_when_enabled(fake_es, client_for, monkeypatch):
+    monkeypatch.setattr(main, "SEARCH_TERMINATE_AFTER", 1000)
+    client = client_for({"7": 1.0})
+
+    client.post("/search", json={"query": "hello", "top_k": 5})
+    client.post("/search", json={"query": "hello", "top_k": 5000})
+
+    assert [s["body"]["terminate_after"] for s in fake_es.searches] == [1000, 5000]
+
+
+def test_search_maps_hits_to_results(fake_es, client_for):
+    fake_es.hits = [{"_id": "p1_0", "_score": 2.5, "_source": CHUNK_SOURCE}]
+
+    resp = client_for({"7": 1.0}).post("/search", json={"query": "hello"})
+
+    assert resp.json() == [
+        {"chunk": {"id": "p1_0", **CHUNK_SOURCE}, "score": 2.5}
+    ]
@@ -1,19 +1,64 @@
+import argparse
 import asyncio
+import hashlib
+import json
 import os
+import random
 import urllib.parse
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
 import httpx
+import orjson
+import zstandard
 from tqdm import tqdm
 
-from shared.models import ScrapboxChunk
+from shared.models import BulkIndexRequest, IndexItem, ScrapboxChunk
 
 # Environment Variables
 PROJECT_NAME = os.getenv("SCRAPBOX_PROJECT")
 SCRAPBOX_SID = os.getenv("SCRAPBOX_SID")
 EMBEDDING_API_URL = os.getenv("EMBEDDING_API_URL", "http://localhost:8001")
 SEARCH_API_URL = os.getenv("SEARCH_API_URL", "http://localhost:8002")
+INGEST_STATE_PATH = os.getenv("INGEST_STATE_PATH", "ingest_state.json")
+# Set to "zstd" to compress request bodies sent to the embedding/search APIs
+REQUEST_COMPRESSION = os.getenv("REQUEST_COMPRESSION", "")
+
+# Independent concurrency budgets for each downstream, so a slow stage does not
+# throttle the others
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "32"))
+INDEX_CONCURRENCY = int(os.getenv("INDEX_CONCURRENCY", "64"))
+SEM_EMBED = asyncio.Semaphore(EMBED_CONCURRENCY)
+SEM_INDEX = asyncio.Semaphore(INDEX_CONCURRENCY)
+
+# Chunks waiting between the fetch/chunk workers and the embed/index consumers
+CHUNK_QUEUE_SIZE = 200
+# Maximum chunks a consumer takes from the queue at a time
+CONSUMER_BATCH_SIZE = 64
+
+_ZSTD = zstandard.ZstdCompressor(level=3)
+
+# Status codes worth retrying for the internal embedding/search APIs
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Upper bound in seconds on one retry wait, including server-sent Retry-After
+MAX_RETRY_DELAY = 30
+
+# Scrapbox page URLs use underscores in place of spaces
+_SPACE_TO_UNDERSCORE = str.maketrans({" ": "_"})
+
+# Client-side embedding batches: up to EMBED_BATCH_SIZE texts, flushed after
+# at most EMBED_BATCH_LATENCY_MS even if the batch is not full
+EMBED_BATCH_SIZE = 32
+EMBED_BATCH_LATENCY_MS = 20
+# Client-side bulk index batches: up to INDEX_BATCH_SIZE chunks, flushed after
+# at most INDEX_BATCH_LATENCY_MS even if the batch is not full
+INDEX_BATCH_SIZE = 64
+INDEX_BATCH_LATENCY_MS = 100
+# Number of distinct chunk texts whose vectors are reused within a run
+EMBED_CACHE_SIZE = 10000
 
 async def fetch_pages(project: str, client: httpx.AsyncClient) -> List[dict]:
     """Retrieves all page metadata from the Scrapbox project.
@@ -33,7 +78,11 @@ async def fetch_pages(project: str, client: httpx.AsyncClient) -> List[dict]:
     resp.raise_for_status()
     return resp.json()["pages"]
 
-async def fetch_page_content(project: str, title: str, client: httpx.AsyncClient) -> Optional[Dict[str, Any]]:
+async def fetch_page_content(
+    project: str,
+    title: str,
+    client: httpx.AsyncClient,
+) -> Optional[Dict[str, Any]]:
     """Retrieves detailed content for a specific Scrapbox page with retry logic.
 
     Args:
@@ -54,49 +103,58 @@ async def fetch_page_content(project: str, title: str, client: httpx.AsyncClient
                 return resp.json()
             if resp.status_code == 404:
                 return None
-            print(f"Warning: Got status {resp.status_code} for {title}. Retrying... ({attempt+1}/3)")
-        except (httpx.ReadError, httpx.ConnectError) as e:
+            print(
+                f"Warning: Got status {resp.status_code} for {title}. "
+                f"Retrying... ({attempt+1}/3)"
+            )
+        except httpx.TransportError as e:
+            # Timeouts and protocol errors (e.g. an HTTP/2 GOAWAY) are retried
+            # too; a page that keeps failing is left for the next run
             print(f"Network error fetching {title}: {e}. Retrying... ({attempt+1}/3)")
         
         await asyncio.sleep(2 ** attempt)  # Exponential backoff
         
     return None
 
-def chunk_page(page_data: Dict[str, Any], project: str) -> List[ScrapboxChunk]:
+def chunk_page(
+    page_data: Dict[str, Any],
+    project: str,
+    page_url_base: str,
+) -> List[ScrapboxChunk]:
     """Segments a Scrapbox page into chunks based on indentation and empty lines.
 
     Args:
         page_data (Dict[str, Any]): The raw page data from Scrapbox API.
-        project (str): The project name for URL construction.
+        project (str): The project name stored on each chunk.
+        page_url_base (str): Project URL prefix, e.g. ``https://scrapbox.io/<project>/``.
 
     Returns:
         List[ScrapboxChunk]: A list of generated text chunks.
     """
+    # Page-level fields are computed once and shared by every chunk
+    page_id = page_data["id"]
     title = page_data["title"]
     lines = page_data["lines"]
-    updated_at = datetime.fromtimestamp(page_data["updated"])
-    page_url = f"https://scrapbox.io/{project}/{title.replace(' ', '_')}"
+    # Serialized once here rather than once per chunk when the body is encoded
+    updated_at = datetime.fromtimestamp(page_data["updated"]).isoformat()
+    page_url = page_url_base + title.translate(_SPACE_TO_UNDERSCORE)
     
     chunks = []
     current_chunk = []
+    current_len = 0  # Total characters in current_chunk, kept incrementally
     current_indent = 0
     
     for i, line_data in enumerate(lines):
         line_text = line_data["text"]
         
         # Determine indent (count leading tabs or spaces)
-        indent = 0
-        for char in line_text:
-            if char == '\t':
-                indent += 1
-            elif char == ' ':
-                indent += 1
-            else:
-                break
+        stripped = line_text.lstrip(" \t")
+        indent = len(line_text) - len(stripped)
+        has_text = bool(stripped.strip())
         
-        # Logic: If empty line or indent level decreases or chunk is too long, start a new chunk
-        is_empty = not line_text.strip()
-        current_len = sum(len(l) for l in current_chunk)
+        # Logic: If empty line or indent level decreases or chunk is too long,
+        # start a new chunk
+        is_empty = not has_text
         is_indent_decrease = (
             i > 0 and indent < current_indent and len(current_chunk) > 5
         )
@@ -105,8 +163,9 @@ def chunk_page(page_data: Dict[str, Any], project: str) -> List[ScrapboxChunk]:
         if is_empty or is_indent_decrease or is_too_long:
             if current_chunk:
                 chunk_text = "\n".join(current_chunk)
-                chunks.append(ScrapboxChunk(
-                    id=f"{page_data['id']}_{len(chunks)}",
+                # Fields are already of the declared types, so skip validation
+                chunks.append(ScrapboxChunk.model_construct(
+                    id=f"{page_id}_{len(chunks)}",
                     project_name=project,
                     page_title=title,
                     content=chunk_text,
@@ -114,17 +173,20 @@ def chunk_page(page_data: Dict[str, Any], project: str) -> List[ScrapboxChunk]:
                     updated_at=updated_at,
                     indent_level=current_indent
                 ))
-                current_chunk = []
+                # Reuse the line buffer; the joined text above is a new string
+                current_chunk.clear()
+                current_len = 0
         
-        if line_text.strip():
+        if has_text:
             if not current_chunk:
                 current_indent = indent
             current_chunk.append(line_text)
+            current_len += len(line_text)
 
     # Add last chunk
     if current_chunk:
-        chunks.append(ScrapboxChunk(
-            id=f"{page_data['id']}_{len(chunks)}",
+        chunks.append(ScrapboxChunk.model_construct(
+            id=f"{page_id}_{len(chunks)}",
             project_name=project,
             page_title=title,
             content="\n".join(current_chunk),
@@ -135,38 +197,456 @@ def chunk_page(page_data: Dict[str, Any], project: str) -> List[ScrapboxChunk]:
         
     return chunks
 
-async def process_and_index(chunk: ScrapboxChunk, client: httpx.AsyncClient, semaphore: asyncio.Semaphore) -> None:
-    """Vectorizes a chunk and indices it into the search engine.
+def json_body(payload: bytes) -> Dict[str, Any]:
+    """Builds ``client.post`` arguments for a JSON body, compressed if enabled.
+
+    Args:
+        payload (bytes): The encoded JSON body.
+
+    Returns:
+        Dict[str, Any]: ``content`` and ``headers`` keyword arguments.
+    """
+    headers = {"Content-Type": "application/json"}
+    if REQUEST_COMPRESSION == "zstd":
+        payload = _ZSTD.compress(payload)
+        headers["Content-Encoding"] = "zstd"
+    return {"content": payload, "headers": headers}
+
+async def post_with_retry(
+    client: httpx.AsyncClient,
+    url: str,
+    semaphore: asyncio.Semaphore,
+    attempts: int = 4,
+    **kwargs: Any,
+) -> httpx.Response:
+    """Posts a request, retrying transient failures with exponential backoff.
+
+    Retries on transport errors and on 429/5xx responses, honoring a numeric
+    ``Retry-After`` header when present. Each wait is capped at
+    ``MAX_RETRY_DELAY`` seconds. The semaphore is only held while a request is
+    in flight, so waiting retries do not block other work.
 
     Args:
-        chunk (ScrapboxChunk): The chunk to be processed.
-        client (httpx.AsyncClient): An active HTTP client for API calls.
+        client (httpx.AsyncClient): The HTTP client to use.
+        url (str): The URL to post to.
         semaphore (asyncio.Semaphore): To limit concurrent requests.
+        attempts (int): Maximum number of attempts.
+        **kwargs (Any): Passed through to ``client.post``.
+
+    Returns:
+        httpx.Response: The first non-retryable response, or the last response
+            if every attempt failed with a retryable status.
+
+    Raises:
+        httpx.TransportError: If the last attempt failed at the transport level.
+    """
+    for attempt in range(attempts):
+        try:
+            async with semaphore:
+                resp = await client.post(url, **kwargs)
+            if resp.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                return resp
+            print(
+                f"Warning: Got status {resp.status_code} from {url}. "
+                f"Retrying... ({attempt+1}/{attempts})"
+            )
+            retry_after = resp.headers.get("Retry-After", "")
+            delay = (
+                min(float(retry_after), MAX_RETRY_DELAY)
+                if retry_after.isdigit()
+                else None
+            )
+        except httpx.TransportError as e:
+            if attempt == attempts - 1:
+                raise
+            print(
+                f"Network error posting to {url}: {e}. "
+                f"Retrying... ({attempt+1}/{attempts})"
+            )
+            delay = None
+
+        if delay is None:
+            # Exponential backoff
+            delay = min(2 ** attempt, MAX_RETRY_DELAY) + random.uniform(0, 1)
+        await asyncio.sleep(delay)
+
+class BackgroundBatcher(ABC):
+    """Base class for queues that a background task drains in batches.
+
+    Items are queued by callers; a background task groups them into batches of
+    up to ``max_batch`` items, waiting at most ``max_latency`` seconds after the
+    first one, and hands each batch to ``_flush``. Use as an async context
+    manager to start and stop the background task.
+
+    Attributes:
+        max_batch (int): Maximum number of items per batch.
+        max_latency (float): Seconds to wait for more items after the first one.
+    """
+
+    def __init__(self, max_batch: int, max_latency_ms: float):
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def __aenter__(self) -> "BackgroundBatcher":
+        """Starts the background batching task."""
+        self._worker = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        """Stops the batching task and waits for in-flight requests."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    async def _run(self) -> None:
+        """Collects queued items into batches until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Send in the background so the next batch can start collecting
+            flush = asyncio.create_task(self._flush(batch))
+            self._flushes.add(flush)
+            flush.add_done_callback(self._flushes.discard)
+
+    @abstractmethod
+    async def _flush(self, batch: List[Any]) -> None:
+        """Processes one batch and resolves the futures queued with it."""
+
+class EmbedBatcher(BackgroundBatcher):
+    """Coalesces embedding requests from many chunks into ``/embed_batch`` calls.
+
+    Texts are queued together with a future and resolved with their vector once
+    their batch returns. Identical texts (common for Scrapbox templates and
+    boilerplate) share one future, so each distinct text is embedded only once
+    while it stays in the cache.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_batch: int = EMBED_BATCH_SIZE,
+        max_latency_ms: float = EMBED_BATCH_LATENCY_MS,
+    ):
+        super().__init__(max_batch, max_latency_ms)
+        self._client = client
+        # Content digest -> future of its vector (pending or resolved), LRU order
+        self._vectors: OrderedDict[bytes, asyncio.Future] = OrderedDict()
+
+    async def embed(self, text: str) -> Dict[str, float]:
+        """Queues a text for vectorization and waits for its vector.
+
+        Args:
+            text (str): The text to vectorize.
+
+        Returns:
+            Dict[str, float]: The sparse vector of the text.
+
+        Raises:
+            RuntimeError: If the embedding API call for its batch failed.
+        """
+        key = hashlib.sha1(text.encode()).digest()
+        future = self._vectors.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._vectors[key] = future
+            if len(self._vectors) > EMBED_CACHE_SIZE:
+                self._vectors.popitem(last=False)
+            await self._queue.put((text, future))
+        else:
+            self._vectors.move_to_end(key)
+
+        try:
+            # Shielded so that one cancelled caller does not fail the others
+            return await asyncio.shield(future)
+        except Exception:
+            # Forget failures so that a later duplicate can retry
+            if self._vectors.get(key) is future:
+                del self._vectors[key]
+            raise
+
+    async def embed_many(self, texts: List[str]) -> List[Dict[str, float]]:
+        """Queues several texts and waits for all of their vectors.
+
+        Args:
+            texts (List[str]): The texts to vectorize.
+
+        Returns:
+            List[Dict[str, float]]: The sparse vectors, in input order.
+
+        Raises:
+            RuntimeError: If the embedding API call for any of the texts failed.
+        """
+        results = await asyncio.gather(
+            *(self.embed(text) for text in texts), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def _flush(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Posts one batch to the embedding API and resolves its futures."""
+        try:
+            resp = await post_with_retry(
+                self._client,
+                f"{EMBEDDING_API_URL}/embed_batch",
+                SEM_EMBED,
+                **json_body(orjson.dumps({"texts": [text for text, _ in batch]}))
+            )
+            if resp.status_code != 200:
+                raise RuntimeError(
+                    f"/embed_batch returned {resp.status_code}: {resp.text}"
+                )
+            vectors = orjson.loads(resp.content)["vectors"]
+            if len(vectors) != len(batch):
+                raise RuntimeError(
+                    f"/embed_batch returned {len(vectors)} vectors"
+                    f" for {len(batch)} texts"
+                )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors, strict=True):
+            if not future.done():
+                future.set_result(vector)
+
+class IndexBatcher(BackgroundBatcher):
+    """Coalesces embedded chunks from all consumers into ``/bulk_index`` calls.
+
+    Each chunk is queued with its vector and a future that resolves to whether
+    the bulk call carrying it succeeded, so consumers that finish embedding at
+    slightly different times still share one index request.
     """
-    async with semaphore:
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        max_batch: int = INDEX_BATCH_SIZE,
+        max_latency_ms: float = INDEX_BATCH_LATENCY_MS,
+    ):
+        super().__init__(max_batch, max_latency_ms)
+        self._client = client
+
+    async def index_many(
+        self, chunks: List[ScrapboxChunk], vectors: List[Dict[str, float]]
+    ) -> bool:
+        """Queues chunks with their vectors and waits until they are indexed.
+
+        Args:
+            chunks (List[ScrapboxChunk]): The chunks to index.
+            vectors (List[Dict[str, float]]): The sparse vectors, in chunk order.
+
+        Returns:
+            bool: True if every chunk was indexed.
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for chunk, vector in zip(chunks, vectors, strict=True):
+            future = loop.create_future()
+            futures.append(future)
+            await self._queue.put((chunk, vector, future))
+        return all(await asyncio.gather(*futures))
+
+    async def _flush(
+        self, batch: List[Tuple[ScrapboxChunk, Dict[str, float], asyncio.Future]]
+    ) -> None:
+        """Posts one batch to the search API and resolves its futures."""
+        # Chunks and vectors are already valid, so skip re-validation and let
+        # Pydantic serialize the whole body to JSON in a single pass
+        body = BulkIndexRequest.model_construct(items=[
+            IndexItem.model_construct(chunk=chunk, vector=vector)
+            for chunk, vector, _ in batch
+        ]).model_dump_json().encode()
+
+        ok = False
         try:
-            # 1. Vectorize
-            resp_embed = await client.post(
-                f"{EMBEDDING_API_URL}/embed",
-                json={"text": chunk.content}
+            resp = await post_with_retry(
+                self._client,
+                f"{SEARCH_API_URL}/bulk_index",
+                SEM_INDEX,
+                **json_body(body)
             )
-            if resp_embed.status_code != 200:
-                print(f"Failed to embed chunk {chunk.id}: {resp_embed.text}")
-                return
-            vector = resp_embed.json()["vector"]
-            
-            # 2. Index
-            resp_index = await client.post(f"{SEARCH_API_URL}/index", json={
-                "chunk": chunk.model_dump(mode="json"),
-                "vector": vector
-            })
-            if resp_index.status_code != 200:
-                print(f"Failed to index chunk {chunk.id}: {resp_index.text}")
+            if resp.status_code != 200:
+                print(f"Failed to index {len(batch)} chunks: {resp.text}")
+            else:
+                # The response only counts failures, so any failure marks the
+                # whole batch for re-indexing on the next run
+                ok = resp.json().get("failed", 0) == 0
         except Exception as e:
-            print(f"Error processing chunk {chunk.id} at {EMBEDDING_API_URL} or {SEARCH_API_URL}: {e}")
+            print(f"Error indexing {len(batch)} chunks at {SEARCH_API_URL}: {e}")
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result(ok)
+
+class IngestState:
+    """Remembers which page versions have been fully indexed.
+
+    The state maps page IDs to the ``updated`` timestamp of the last version
+    whose chunks were all indexed successfully. It is persisted as JSON so
+    later runs can skip unchanged pages.
+
+    Attributes:
+        path (str): Location of the JSON state file.
+        indexed (Dict[str, int]): Page ID to indexed ``updated`` timestamp.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.indexed: Dict[str, int] = {}
+        # page ID -> (updated, chunks still to be indexed)
+        self._pending: Dict[str, Tuple[int, int]] = {}
+        self._failed: Set[str] = set()
+        self._chunk_pages: Dict[str, str] = {}  # chunk ID -> page ID
+
+    def load(self) -> None:
+        """Loads the state file, starting empty if it does not exist."""
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.indexed = json.load(f)
+        except FileNotFoundError:
+            self.indexed = {}
+
+    def save(self) -> None:
+        """Writes the state file atomically."""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.indexed, f)
+        os.replace(tmp_path, self.path)
+
+    def is_current(self, page_summary: Dict[str, Any]) -> bool:
+        """Checks whether this version of a page has already been indexed.
+
+        Args:
+            page_summary (Dict[str, Any]): Page summary from the pages list API.
+
+        Returns:
+            bool: True if the page is unchanged since it was last indexed.
+        """
+        return self.indexed.get(page_summary["id"]) == page_summary["updated"]
+
+    def expect(self, page_data: Dict[str, Any], chunks: List[ScrapboxChunk]) -> None:
+        """Registers the chunks of a page that are about to be indexed.
+
+        Args:
+            page_data (Dict[str, Any]): The raw page data from Scrapbox API.
+            chunks (List[ScrapboxChunk]): The chunks generated from the page.
+        """
+        page_id = page_data["id"]
+        if not chunks:
+            self.indexed[page_id] = page_data["updated"]
+            return
+        self._pending[page_id] = (page_data["updated"], len(chunks))
+        for chunk in chunks:
+            self._chunk_pages[chunk.id] = page_id
+
+    def record(self, chunks: List[ScrapboxChunk], ok: bool) -> None:
+        """Records the outcome of indexing chunks; completes finished pages.
+
+        Args:
+            chunks (List[ScrapboxChunk]): The chunks that were processed.
+            ok (bool): Whether they were all indexed successfully.
+        """
+        for chunk in chunks:
+            page_id = self._chunk_pages.pop(chunk.id)
+            if not ok:
+                self._failed.add(page_id)
+            updated, left = self._pending[page_id]
+            if left > 1:
+                self._pending[page_id] = (updated, left - 1)
+                continue
+            del self._pending[page_id]
+            if page_id in self._failed:
+                self._failed.discard(page_id)
+            else:
+                self.indexed[page_id] = updated
+
+async def process_and_index(
+    chunks: List[ScrapboxChunk],
+    embed_batcher: EmbedBatcher,
+    index_batcher: IndexBatcher,
+) -> bool:
+    """Vectorizes chunks and indexes them into the search engine.
+
+    Args:
+        chunks (List[ScrapboxChunk]): The chunks to be processed.
+        embed_batcher (EmbedBatcher): Batches embedding calls across consumers.
+        index_batcher (IndexBatcher): Batches bulk index calls across consumers.
+
+    Returns:
+        bool: True if every chunk was embedded and indexed.
+    """
+    if not chunks:
+        return True
+
+    # 1. Vectorize
+    try:
+        vectors = await embed_batcher.embed_many([chunk.content for chunk in chunks])
+    except Exception as e:
+        print(f"Error embedding {len(chunks)} chunks at {EMBEDDING_API_URL}: {e}")
+        return False
+
+    # 2. Index
+    return await index_batcher.index_many(chunks, vectors)
+
+async def consume_chunks(
+    queue: asyncio.Queue,
+    embed_batcher: EmbedBatcher,
+    index_batcher: IndexBatcher,
+    state: IngestState,
+) -> None:
+    """Embeds and indexes queued chunks until a ``None`` sentinel is received.
+
+    Chunks that are already waiting in the queue are taken along with the
+    current one, up to ``CONSUMER_BATCH_SIZE`` chunks at a time.
+
+    Args:
+        queue (asyncio.Queue): Queue of chunks, terminated by ``None``.
+        embed_batcher (EmbedBatcher): Batches embedding calls across consumers.
+        index_batcher (IndexBatcher): Batches bulk index calls across consumers.
+        state (IngestState): Records which pages were fully indexed.
+    """
+    while (chunk := await queue.get()) is not None:
+        chunks = [chunk]
+        done = False
+        while len(chunks) < CONSUMER_BATCH_SIZE:
+            try:
+                next_chunk = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if next_chunk is None:
+                done = True
+                break
+            chunks.append(next_chunk)
+
+        ok = await process_and_index(chunks, embed_batcher, index_batcher)
+        state.record(chunks, ok)
+        if done:
+            return
 
 async def wait_for_services(client: httpx.AsyncClient) -> bool:
-    """Waits for backend API services to become healthy."""
+    """Waits for backend API services to become healthy.
+
+    The health checks also open pooled connections to each service, so the
+    ingestion loop starts with warm keep-alive connections.
+    """
     for api_name, url in [("Embedding", EMBEDDING_API_URL), ("Search", SEARCH_API_URL)]:
         print(f"Checking {api_name} API at {url}...")
         for i in range(20):
@@ -185,17 +665,45 @@ async def wait_for_services(client: httpx.AsyncClient) -> bool:
             return False
     return True
 
-async def main() -> None:
+async def main(full: bool = False) -> None:
     """Main entry point for the Scrapbox data ingestion batch.
 
     Orchestrates the process of fetching, chunking, and indexing pages.
+    Pages whose ``updated`` timestamp matches the last successful run are
+    skipped unless ``full`` is set.
+
+    Args:
+        full (bool): Re-index every page, ignoring the saved ingestion state.
     """
     if not PROJECT_NAME:
         print("Error: SCRAPBOX_PROJECT is not set.")
         return
 
+    state = IngestState(INGEST_STATE_PATH)
+    if not full:
+        state.load()
+
     headers = {"Cookie": f"connect.sid={SCRAPBOX_SID}"} if SCRAPBOX_SID else {}
-    async with httpx.AsyncClient(headers=headers, timeout=60.0) as client:
+    # One pooled client for Scrapbox and the internal APIs. HTTP/2 multiplexes
+    # concurrent Scrapbox requests over a single TLS connection, and connect
+    # errors are retried at the transport level.
+    client = httpx.AsyncClient(
+        headers=headers,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        transport=httpx.AsyncHTTPTransport(
+            # Room for every stage's concurrency budget at once
+            limits=httpx.Limits(
+                max_connections=128, max_keepalive_connections=64, keepalive_expiry=60
+            ),
+            http2=True,
+            retries=2,
+        ),
+    )
+    async with (
+        client,
+        EmbedBatcher(client) as embed_batcher,
+        IndexBatcher(client) as index_batcher,
+    ):
         if not await wait_for_services(client):
             return
 
@@ -205,21 +713,71 @@ async def main() -> None:
         except Exception as e:
             print(f"Failed to fetch pages: {e}")
             return
-        
-        semaphore = asyncio.Semaphore(10) # Limit concurrency
-        for page_summary in tqdm(pages, desc="Processing pages"):
-            page_data = await fetch_page_content(PROJECT_NAME, page_summary["title"], client)
-            if not page_data:
-                continue
-                
-            chunks = chunk_page(page_data, PROJECT_NAME)
-            
-            # Process chunks in parallel for this page
-            tasks = [process_and_index(chunk, client, semaphore) for chunk in chunks]
-            await asyncio.gather(*tasks)
 
-if __name__ == "__main__":
-    asyncio.run(main())
+        changed = [page for page in pages if not state.is_current(page)]
+        print(f"{len(changed)} of {len(pages)} pages changed since the last run")
+        pages = changed
+
+        page_url_base = f"https://scrapbox.io/{PROJECT_NAME}/"
+
+        # Producer/consumer pipeline: FETCH_CONCURRENCY workers fetch and chunk
+        # pages while a pool of consumers embeds and indexes chunks from a
+        # bounded queue. A worker only fetches its next page once the queue has
+        # taken all chunks of the previous one, so a lagging consumer side holds
+        # back fetching instead of letting fetched pages pile up in memory.
+        queue: asyncio.Queue = asyncio.Queue(maxsize=CHUNK_QUEUE_SIZE)
+        titles = iter([page_summary["title"] for page_summary in pages])
+
+        async def fetch_and_chunk(pbar: tqdm) -> None:
+            # The iterator is shared, so each title is taken by exactly one worker
+            for title in titles:
+                page_data = await fetch_page_content(PROJECT_NAME, title, client)
+                pbar.update(1)
+                if not page_data:
+                    continue
+
+                # Chunking runs in a worker thread so large pages do not stall
+                # the HTTP tasks on the event loop
+                chunks = await asyncio.to_thread(
+                    chunk_page, page_data, PROJECT_NAME, page_url_base
+                )
+                state.expect(page_data, chunks)
+                for chunk in chunks:
+                    await queue.put(chunk)
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                consumers = [
+                    tg.create_task(
+                        consume_chunks(queue, embed_batcher, index_batcher, state)
+                    )
+                    for _ in range(EMBED_CONCURRENCY)
+                ]
+                with tqdm(total=len(pages), desc="Processing pages") as pbar:
+                    async with asyncio.TaskGroup() as producers:
+                        for _ in range(FETCH_CONCURRENCY):
+                            producers.create_task(fetch_and_chunk(pbar))
+
+                # One sentinel per consumer signals the end of the input
+                for _ in consumers:
+                    await queue.put(None)
+        finally:
+            # Persist progress of interrupted runs too
+            state.save()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Scrapbox data ingestion batch")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="Re-index every page, ignoring the saved ingestion state",
+    )
+    args = parser.parse_args()
+
+    # uvloop speeds up the many small HTTP round-trips; fall back if unavailable
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main(full=args.full))
+    else:
+        uvloop.run(main(full=args.full))
@@ -0,0 +1,34 @@
+import asyncio
+
+import httpx
+import main
+import pytest
+from fakes import PROJECT, FakeServices
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    """Makes retry backoff sleeps return immediately."""
+    async def no_sleep(_delay: float) -> None:
+        return None
+
+    monkeypatch.setattr(main.asyncio, "sleep", no_sleep)
+
+
+@pytest.fixture
+def ingest(monkeypatch, tmp_path):
+    """Routes the batch's HTTP client to ``FakeServices`` and isolates its state."""
+    monkeypatch.setattr(main, "PROJECT_NAME", PROJECT)
+    monkeypatch.setattr(main, "INGEST_STATE_PATH", str(tmp_path / "state.json"))
+    # Semaphores bind to the event loop of their first contended use
+    monkeypatch.setattr(main, "SEM_EMBED", asyncio.Semaphore(main.EMBED_CONCURRENCY))
+    monkeypatch.setattr(main, "SEM_INDEX", asyncio.Semaphore(main.INDEX_CONCURRENCY))
+
+    def use(services: FakeServices) -> None:
+        monkeypatch.setattr(
+            main.httpx,
+            "AsyncHTTPTransport",
+            lambda **_kwargs: httpx.MockTransport(services),
+        )
+
+    return use
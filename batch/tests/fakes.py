@@ -0,0 +1,63 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+import orjson
+
+PROJECT = "project"
+
+
+def make_page(page_id: str, updated: int, lines: List[str]) -> Dict[str, Any]:
+    """Builds Scrapbox page data whose title is its first line."""
+    return {
+        "id": page_id,
+        "title": lines[0],
+        "updated": updated,
+        "lines": [{"text": text} for text in lines],
+    }
+
+
+class FakeServices:
+    """In-memory Scrapbox, embedding and search APIs behind a mock transport."""
+
+    def __init__(self, pages: List[Dict[str, Any]]):
+        self.pages = {page["title"]: page for page in pages}
+        self.fetched: List[str] = []
+        self.indexed: Dict[str, Dict[str, Any]] = {}
+        # Chunk IDs that /bulk_index reports as failed
+        self.failing_chunks: Set[str] = set()
+        # When set, /embed_batch waits for the event before answering
+        self.embed_gate: Optional[asyncio.Event] = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path.endswith("/health"):
+            return httpx.Response(200, json={"status": "ok"})
+        if request.url.host == "scrapbox.io":
+            if path == f"/api/pages/{PROJECT}":
+                return httpx.Response(200, json={"pages": [
+                    {key: page[key] for key in ("id", "title", "updated")}
+                    for page in self.pages.values()
+                ]})
+            title = path.rsplit("/", 1)[-1]
+            self.fetched.append(title)
+            return httpx.Response(200, json=self.pages[title])
+
+        body = orjson.loads(request.content)
+        if path == "/embed_batch":
+            if self.embed_gate is not None:
+                await self.embed_gate.wait()
+            return httpx.Response(
+                200, json={"vectors": [{"1": 1.0} for _ in body["texts"]]}
+            )
+        if path == "/bulk_index":
+            failed = 0
+            for item in body["items"]:
+                if item["chunk"]["id"] in self.failing_chunks:
+                    failed += 1
+                else:
+                    self.indexed[item["chunk"]["id"]] = item
+            return httpx.Response(200, json={
+                "result": "ok", "indexed": len(body["items"]) - failed, "failed": failed
+            })
+        return httpx.Response(404)
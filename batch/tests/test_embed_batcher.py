@@ -0,0 +1,98 @@
+import asyncio
+
+import httpx
+import main
+import orjson
+
+
+class FakeEmbeddingAPI:
+    """Answers /embed_batch with one vector per text, or with ``status``."""
+
+    def __init__(self):
+        self.calls = []
+        self.status = 200
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        texts = orjson.loads(request.content)["texts"]
+        self.calls.append(texts)
+        if self.status != 200:
+            return httpx.Response(self.status, text="bad request")
+        return httpx.Response(200, json={"vectors": [{text: 1.0} for text in texts]})
+
+
+def run_with_batcher(api, scenario):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(api)) as client:
+            async with main.EmbedBatcher(client) as batcher:
+                return await scenario(batcher)
+
+    return asyncio.run(run())
+
+
+def test_embed_many_sends_identical_texts_once():
+    api = FakeEmbeddingAPI()
+
+    vectors = run_with_batcher(api, lambda b: b.embed_many(["a", "a", "b"]))
+
+    assert vectors == [{"a": 1.0}, {"a": 1.0}, {"b": 1.0}]
+    assert api.calls == [["a", "b"]]
+
+
+def test_embed_reuses_cached_vectors():
+    api = FakeEmbeddingAPI()
+
+    async def scenario(batcher):
+        first = await batcher.embed("a")
+        return first, await batcher.embed("a")
+
+    first, second = run_with_batcher(api, scenario)
+
+    assert first == second == {"a": 1.0}
+    assert api.calls == [["a"]]
+
+
+def test_failed_texts_are_evicted_and_retried():
+    api = FakeEmbeddingAPI()
+    api.status = 400
+
+    async def scenario(batcher):
+        try:
+            await batcher.embed_many(["a", "a"])
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("expected the batch to fail")
+        api.status = 200
+        return await batcher.embed("a")
+
+    assert run_with_batcher(api, scenario) == {"a": 1.0}
+    assert api.calls == [["a"], ["a"]]
+
+
+def test_cache_keeps_most_recent_texts(monkeypatch):
+    monkeypatch.setattr(main, "EMBED_CACHE_SIZE", 2)
+    api = FakeEmbeddingAPI()
+
+    async def scenario(batcher):
+        for text in ["a", "b", "a", "c", "a", "b"]:
+            await batcher.embed(text)
+
+    run_with_batcher(api, scenario)
+
+    # "b" is the least recently used text when "c" is added
+    assert api.calls == [["a"], ["b"], ["c"], ["b"]]
+
+
+def test_vector_count_mismatch_fails_the_batch():
+    def api(_request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"vectors": [{"a": 1.0}]})
+
+    async def scenario(batcher):
+        try:
+            await batcher.embed_many(["a", "b"])
+        except RuntimeError as e:
+            return str(e)
+
+    assert run_with_batcher(api, scenario) == (
+        "/embed_batch returned 1 vectors for 2 texts"
+    )
@@ -0,0 +1,41 @@
+import asyncio
+
+import httpx
+import main
+import pytest
+
+
+@pytest.mark.usefixtures("no_backoff")
+def test_fetch_page_content_skips_page_after_transport_errors():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        raise httpx.RemoteProtocolError("GOAWAY", request=request)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await main.fetch_page_content("project", "A page", client)
+
+    assert asyncio.run(run()) is None
+    assert calls == ["/api/pages/project/A page"] * 3
+
+
+@pytest.mark.usefixtures("no_backoff")
+def test_fetch_page_content_returns_page_after_retry():
+    responses = iter([
+        httpx.ReadTimeout("timed out"),
+        httpx.Response(200, json={"id": "p1", "lines": []}),
+    ])
+
+    def handler(_request: httpx.Request) -> httpx.Response:
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await main.fetch_page_content("project", "A page", client)
+
+    assert asyncio.run(run()) == {"id": "p1", "lines": []}
@@ -0,0 +1,118 @@
+import asyncio
+import json
+
+import main
+import pytest
+from fakes import FakeServices, make_page
+
+
+def chunks_of(page):
+    return main.chunk_page(page, "project", "https://scrapbox.io/project/")
+
+
+def test_page_is_recorded_after_all_chunks_succeed(tmp_path):
+    state = main.IngestState(str(tmp_path / "state.json"))
+    page = make_page("p1", 100, ["Title", "a", "", "b"])
+    chunks = chunks_of(page)
+    assert len(chunks) == 2
+
+    state.expect(page, chunks)
+    state.record(chunks[:1], ok=True)
+    assert "p1" not in state.indexed
+
+    state.record(chunks[1:], ok=True)
+    assert state.indexed == {"p1": 100}
+
+
+def test_page_with_partial_failure_is_not_recorded(tmp_path):
+    state = main.IngestState(str(tmp_path / "state.json"))
+    page = make_page("p1", 100, ["Title", "a", "", "b", "", "c"])
+    chunks = chunks_of(page)
+
+    state.expect(page, chunks)
+    state.record(chunks[:1], ok=True)
+    state.record(chunks[1:2], ok=False)
+    state.record(chunks[2:], ok=True)
+
+    assert state.indexed == {}
+    # A later version of the page is tracked from a clean slate
+    newer = make_page("p1", 200, ["Title", "a"])
+    newer_chunks = chunks_of(newer)
+    state.expect(newer, newer_chunks)
+    state.record(newer_chunks, ok=True)
+    assert state.indexed == {"p1": 200}
+
+
+def test_page_without_chunks_is_recorded(tmp_path):
+    state = main.IngestState(str(tmp_path / "state.json"))
+
+    state.expect(make_page("p1", 100, ["", ""]), [])
+
+    assert state.indexed == {"p1": 100}
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "state.json"
+    state = main.IngestState(str(path))
+    state.indexed = {"p1": 100}
+    state.save()
+
+    loaded = main.IngestState(str(path))
+    loaded.load()
+
+    assert loaded.indexed == {"p1": 100}
+    assert loaded.is_current({"id": "p1", "updated": 100})
+    assert not loaded.is_current({"id": "p1", "updated": 101})
+
+
+def test_save_keeps_previous_file_when_writing_fails(tmp_path):
+    path = tmp_path / "state.json"
+    state = main.IngestState(str(path))
+    state.indexed = {"p1": 100}
+    state.save()
+
+    state.indexed = {"p1": 100, "p2": object()}
+    with pytest.raises(TypeError):
+        state.save()
+
+    assert json.loads(path.read_text()) == {"p1": 100}
+
+
+def test_incremental_run_retries_pages_with_failed_chunks(ingest):
+    services = FakeServices([
+        make_page("p1", 100, ["Page one", "first", "", "second"]),
+        make_page("p2", 200, ["Page two", "third"]),
+    ])
+    services.failing_chunks = {"p1_1"}
+    ingest(services)
+
+    asyncio.run(main.main())
+
+    state = main.IngestState(main.INGEST_STATE_PATH)
+    state.load()
+    # Pages sharing a bulk call with the failure may be left out too
+    assert "p1" not in state.indexed
+
+    services.fetched.clear()
+    services.failing_chunks.clear()
+    asyncio.run(main.main())
+
+    assert "Page one" in services.fetched
+    state.load()
+    assert state.indexed == {"p1": 100, "p2": 200}
+
+
+def test_full_run_ignores_saved_state(ingest):
+    services = FakeServices([
+        make_page("p1", 100, ["Page one", "first"]),
+        make_page("p2", 200, ["Page two", "second"]),
+    ])
+    ingest(services)
+    asyncio.run(main.main())
+
+    services.fetched.clear()
+    asyncio.run(main.main())
+    assert services.fetched == []
+
+    asyncio.run(main.main(full=True))
+    assert sorted(services.fetched) == ["Page one", "Page two"]
@@ -0,0 +1,42 @@
+import asyncio
+
+import main
+from fakes import FakeServices, make_page
+
+
+def test_main_indexes_every_chunk(ingest):
+    services = FakeServices([
+        make_page("p1", 100, ["Page one", "first", "", "second"]),
+        make_page("p2", 200, ["Page two", "third"]),
+    ])
+    ingest(services)
+
+    asyncio.run(main.main())
+
+    assert sorted(services.indexed) == ["p1_0", "p1_1", "p2_0"]
+    assert services.indexed["p1_1"]["chunk"]["content"] == "second"
+
+
+def test_fetching_waits_for_slow_consumers(ingest, monkeypatch):
+    services = FakeServices([
+        make_page(f"p{i}", 100, [f"Page {i}", f"text {i}"]) for i in range(20)
+    ])
+    services.embed_gate = asyncio.Event()
+    ingest(services)
+    monkeypatch.setattr(main, "FETCH_CONCURRENCY", 2)
+    monkeypatch.setattr(main, "EMBED_CONCURRENCY", 1)
+    monkeypatch.setattr(main, "CONSUMER_BATCH_SIZE", 1)
+    monkeypatch.setattr(main, "CHUNK_QUEUE_SIZE", 2)
+
+    async def run():
+        task = asyncio.create_task(main.main())
+        await asyncio.sleep(0.5)
+        # One page with the stalled consumer, two in the queue, and one waiting
+        # to be queued per fetch worker
+        fetched_while_stalled = len(services.fetched)
+        services.embed_gate.set()
+        await task
+        return fetched_while_stalled
+
+    assert asyncio.run(run()) <= 5
+    assert len(services.indexed) == 20
@@ -0,0 +1,69 @@
+import asyncio
+
+import httpx
+import main
+import pytest
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Records retry waits instead of sleeping."""
+    delays = []
+
+    async def fake_sleep(delay: float) -> None:
+        delays.append(delay)
+
+    monkeypatch.setattr(main.asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def post(responses):
+    """Posts through ``post_with_retry``; the server answers with ``responses``."""
+    responses = iter(responses)
+
+    def handler(_request: httpx.Request) -> httpx.Response:
+        response = next(responses)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await main.post_with_retry(
+                client, "http://api/embed_batch", asyncio.Semaphore(1)
+            )
+
+    return asyncio.run(run())
+
+
+def test_retries_retryable_statuses_until_success(sleeps):
+    resp = post([httpx.Response(503), httpx.Response(502), httpx.Response(200)])
+
+    assert resp.status_code == 200
+    assert len(sleeps) == 2
+
+
+def test_non_retryable_status_is_returned_immediately(sleeps):
+    resp = post([httpx.Response(400)])
+
+    assert resp.status_code == 400
+    assert sleeps == []
+
+
+def test_retry_after_is_honored_and_capped(sleeps):
+    resp = post([
+        httpx.Response(429, headers={"Retry-After": "3"}),
+        httpx.Response(429, headers={"Retry-After": "3600"}),
+        httpx.Response(200),
+    ])
+
+    assert resp.status_code == 200
+    assert sleeps == [3.0, main.MAX_RETRY_DELAY]
+
+
+def test_transport_error_on_last_attempt_is_raised(sleeps):
+    with pytest.raises(httpx.ConnectError):
+        post([httpx.ConnectError("refused")] * 4)
+
+    assert len(sleeps) == 3
+    assert all(delay <= main.MAX_RETRY_DELAY + 1 for delay in sleeps)
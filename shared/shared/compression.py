@@ -0,0 +1,131 @@
+"""Request body compression support for the Scrapbox RAG services.
+
+This module provides an ASGI middleware that transparently decompresses
+``Content-Encoding: zstd`` request bodies, so internal clients can opt in to
+compressed uploads without changing the endpoints themselves.
+"""
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+import zstandard
+
+# Upper bound on the decompressed size of one request body, so a small
+# compressed body cannot expand into gigabytes in memory
+MAX_DECOMPRESSED_BYTES = int(
+    os.getenv("MAX_DECOMPRESSED_BYTES", str(32 * 1024 * 1024))
+)
+# Decompressed bytes produced per read while enforcing the limit
+_READ_SIZE = 1024 * 1024
+
+Scope = Dict[str, Any]
+Message = Dict[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+class ZstdRequestMiddleware:
+    """ASGI middleware that decompresses zstd-encoded request bodies.
+
+    Requests without ``Content-Encoding: zstd`` are passed through untouched.
+    Bodies that fail to decompress are rejected with ``400 Bad Request``, and
+    bodies that decompress to more than ``max_body_size`` bytes with
+    ``413 Content Too Large``.
+
+    Attributes:
+        app (ASGIApp): The wrapped ASGI application.
+        max_body_size (int): Maximum decompressed body size in bytes.
+    """
+
+    def __init__(self, app: ASGIApp, max_body_size: int = MAX_DECOMPRESSED_BYTES):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Handles one ASGI connection.
+
+        Args:
+            scope (Scope): The ASGI connection scope.
+            receive (Receive): Callable returning incoming messages.
+            send (Send): Callable sending outgoing messages.
+        """
+        if scope["type"] != "http" or not _is_zstd(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        try:
+            body = _decompress(b"".join(chunks), self.max_body_size)
+        except zstandard.ZstdError:
+            await _send_error(send, 400, b"Invalid zstd request body")
+            return
+        except _BodyTooLarge:
+            await _send_error(send, 413, b"Decompressed request body too large")
+            return
+
+        headers = [
+            (name, value)
+            for name, value in scope["headers"]
+            if name.lower() not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode()))
+
+        body_sent = False
+
+        async def receive_decompressed() -> Message:
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(dict(scope, headers=headers), receive_decompressed, send)
+
+
+def _is_zstd(headers: List[Tuple[bytes, bytes]]) -> bool:
+    """Checks whether the request body is zstd-encoded."""
+    return any(
+        name.lower() == b"content-encoding" and value.strip().lower() == b"zstd"
+        for name, value in headers
+    )
+
+
+class _BodyTooLarge(Exception):
+    """Raised when a body decompresses to more than the allowed size."""
+
+
+def _decompress(data: bytes, limit: int) -> bytes:
+    """Decompresses a zstd frame, stopping as soon as it exceeds ``limit`` bytes.
+
+    Raises:
+        zstandard.ZstdError: If the data is not valid zstd.
+        _BodyTooLarge: If the decompressed data exceeds ``limit`` bytes.
+    """
+    parts = []
+    size = 0
+    with zstandard.ZstdDecompressor().stream_reader(data) as reader:
+        while part := reader.read(_READ_SIZE):
+            size += len(part)
+            if size > limit:
+                raise _BodyTooLarge
+            parts.append(part)
+    return b"".join(parts)
+
+
+async def _send_error(send: Send, status: int, detail: bytes) -> None:
+    """Sends a plain-text error response for a rejected body."""
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", str(len(detail)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": detail})
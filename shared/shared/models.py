@@ -3,10 +3,9 @@
 This module defines the Pydantic models used for communication between
 the different microservices, including data ingestion, search, and LLM generation.
 """
-from datetime import datetime
 from typing import Dict, List
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class ScrapboxChunk(BaseModel):
@@ -18,10 +17,12 @@ class ScrapboxChunk(BaseModel):
         page_title (str): The title of the original page.
         content (str): The actual text content of the chunk.
         url (str): The direct URL to the Scrapbox page.
-        updated_at (datetime): When the page was last updated.
+        updated_at (str): When the page was last updated (ISO 8601).
         indent_level (int): The indentation level of the first line.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     id: str = Field(
         ...,
         description="Unique ID for the chunk (e.g., pageId_chunkIndex)"
@@ -30,9 +31,9 @@ class ScrapboxChunk(BaseModel):
     page_title: str = Field(..., description="Original page title")
     content: str = Field(..., description="Chunked text content")
     url: str = Field(..., description="Direct link to the Scrapbox page")
-    updated_at: datetime = Field(
+    updated_at: str = Field(
         ...,
-        description="Last updated timestamp of the page"
+        description="Last updated timestamp of the page (ISO 8601)"
     )
     indent_level: int = Field(
         0, description="Nesting level of the first line in this chunk"
@@ -45,6 +46,8 @@ class EmbeddingRequest(BaseModel):
         text (str): The source text to vectorize.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     text: str = Field(..., description="Text to be vectorized")
 
 
@@ -56,11 +59,40 @@ class EmbeddingResponse(BaseModel):
             of indices to weights.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     vector: Dict[int, float] = Field(
         ..., description="Indices and weights of the sparse vector"
     )
 
 
+class EmbeddingBatchRequest(BaseModel):
+    """Request schema for vectorizing several texts at once.
+
+    Attributes:
+        texts (List[str]): The source texts to vectorize.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    texts: List[str] = Field(..., description="Texts to be vectorized")
+
+
+class EmbeddingBatchResponse(BaseModel):
+    """Response schema for batched vector transformation.
+
+    Attributes:
+        vectors (List[Dict[int, float]]): Sparse vectors in the same order as
+            the input texts.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    vectors: List[Dict[int, float]] = Field(
+        ..., description="Sparse vectors in the order of the input texts"
+    )
+
+
 class SearchQuery(BaseModel):
     """Request schema for searching chunks.
 
@@ -69,6 +101,8 @@ class SearchQuery(BaseModel):
         top_k (int): Maximum number of results to return.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     query: str = Field(..., description="Natural language search query")
     top_k: int = Field(5, description="Number of results to return")
 
@@ -81,6 +115,8 @@ class SearchResultItem(BaseModel):
         score (float): Relevance score calculated by the search engine.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     chunk: ScrapboxChunk
     score: float = Field(..., description="Relevance score (hybrid search)")
 
@@ -92,9 +128,39 @@ class SearchResponse(BaseModel):
         results (List[SearchResultItem]): List of ranked search results.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     results: List[SearchResultItem]
 
 
+class IndexItem(BaseModel):
+    """A chunk paired with its sparse vector, ready to be indexed.
+
+    Attributes:
+        chunk (ScrapboxChunk): The chunk metadata and content.
+        vector (Dict[str, float]): Sparse vector weights keyed by feature index.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    chunk: ScrapboxChunk
+    vector: Dict[str, float] = Field(
+        ..., description="Indices and weights of the sparse vector"
+    )
+
+
+class BulkIndexRequest(BaseModel):
+    """Request schema for indexing many chunks in one call.
+
+    Attributes:
+        items (List[IndexItem]): Chunks and vectors to index.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    items: List[IndexItem] = Field(..., description="Chunks to be indexed")
+
+
 class LLMRequest(BaseModel):
     """Request schema for LLM response generation.
 
@@ -103,6 +169,8 @@ class LLMRequest(BaseModel):
         context (List[ScrapboxChunk]): List of relevant chunks to use as context.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     query: str = Field(..., description="User's original question")
     context: List[ScrapboxChunk] = Field(
         ..., description="Relevant chunks retrieved from search"
@@ -117,6 +185,8 @@ class LLMResponse(BaseModel):
         sources (List[str]): List of URLs for the sources used in the answer.
     """
 
+    model_config = ConfigDict(frozen=True)
+
     answer: str = Field(..., description="Generated answer from LLM")
     sources: List[str] = Field(
         ..., description="List of source URLs used for the answer"
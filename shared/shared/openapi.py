@@ -0,0 +1,41 @@
+"""OpenAPI helpers for the Scrapbox RAG services.
+
+Endpoints that read the raw request body for speed lose their request schema
+in the generated ``/docs``. This module builds the ``openapi_extra`` needed to
+document such bodies with the shared Pydantic models.
+"""
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel
+
+
+def json_request_body(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Builds ``openapi_extra`` declaring a JSON request body of ``model``.
+
+    Nested models are inlined, because ``$defs`` references of a standalone
+    JSON schema do not resolve inside the OpenAPI document.
+
+    Args:
+        model (Type[BaseModel]): The model describing the request body.
+
+    Returns:
+        Dict[str, Any]: The ``openapi_extra`` argument for a route decorator.
+    """
+    schema = model.model_json_schema()
+    defs = schema.pop("$defs", {})
+
+    def inline(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return inline(defs[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: inline(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [inline(value) for value in node]
+        return node
+
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": inline(schema)}},
+        }
+    }
@@ -0,0 +1,92 @@
+import asyncio
+
+import zstandard
+
+from shared.compression import ZstdRequestMiddleware
+
+
+async def echo_app(scope, receive, send):
+    """Responds with the request body and its Content-Length header."""
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    headers = dict(scope["headers"])
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"x-content-length", headers.get(b"content-length", b""))],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def post(body, encoding=None, max_body_size=1024):
+    """Sends ``body`` through the middleware; returns status, headers and body."""
+    headers = [(b"content-length", str(len(body)).encode())]
+    if encoding:
+        headers.append((b"content-encoding", encoding))
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": headers}
+    messages = [
+        {"type": "http.request", "body": body[:3], "more_body": True},
+        {"type": "http.request", "body": body[3:], "more_body": False},
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = ZstdRequestMiddleware(echo_app, max_body_size=max_body_size)
+    asyncio.run(middleware(scope, receive, send))
+    start, response = sent
+    return start["status"], dict(start["headers"]), response["body"]
+
+
+def test_uncompressed_body_passes_through():
+    status, _, body = post(b'{"text": "hello"}')
+
+    assert status == 200
+    assert body == b'{"text": "hello"}'
+
+
+def test_zstd_body_is_decompressed():
+    payload = b'{"text": "hello"}' * 10
+    compressed = zstandard.ZstdCompressor().compress(payload)
+
+    status, headers, body = post(compressed, encoding=b"zstd")
+
+    assert status == 200
+    assert body == payload
+    assert headers[b"x-content-length"] == str(len(payload)).encode()
+
+
+def test_corrupt_zstd_body_is_rejected():
+    status, _, body = post(b"not zstd at all", encoding=b"zstd")
+
+    assert status == 400
+    assert body == b"Invalid zstd request body"
+
+
+def test_oversized_zstd_body_is_rejected():
+    # A tiny frame that expands far beyond the limit
+    compressed = zstandard.ZstdCompressor().compress(b"\0" * (10 * 1024 * 1024))
+    assert len(compressed) < 1024
+
+    status, _, body = post(compressed, encoding=b"zstd")
+
+    assert status == 413
+    assert body == b"Decompressed request body too large"
+
+
+def test_body_at_the_limit_is_accepted():
+    payload = b"x" * 1024
+    compressed = zstandard.ZstdCompressor().compress(payload)
+
+    status, _, body = post(compressed, encoding=b"zstd")
+
+    assert status == 200
+    assert body == payload
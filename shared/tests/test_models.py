@@ -0,0 +1,52 @@
+import re
+from pathlib import Path
+
+import pydantic
+import pytest
+
+from shared import models
+from shared.models import ScrapboxChunk
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+SKIPPED_DIRS = {".venv", "venv", "node_modules", ".git"}
+SHARED_MODELS = sorted(
+    name
+    for name, value in vars(models).items()
+    if isinstance(value, type)
+    and issubclass(value, pydantic.BaseModel)
+    and value.__module__ == models.__name__
+)
+
+
+def python_sources():
+    for path in REPO_ROOT.rglob("*.py"):
+        if not SKIPPED_DIRS.intersection(path.relative_to(REPO_ROOT).parts):
+            yield path
+
+
+@pytest.mark.parametrize("name", SHARED_MODELS)
+def test_shared_models_are_defined_only_in_shared(name):
+    definition = re.compile(rf"^class {name}\b", re.MULTILINE)
+
+    defined_in = [
+        path.relative_to(REPO_ROOT).as_posix()
+        for path in python_sources()
+        if definition.search(path.read_text(encoding="utf-8"))
+    ]
+
+    assert defined_in == ["shared/shared/models.py"]
+
+
+def test_scrapbox_chunk_is_frozen():
+    chunk = ScrapboxChunk(
+        id="p1_0",
+        project_name="project",
+        page_title="Page",
+        content="text",
+        url="https://scrapbox.io/project/Page",
+        updated_at="2024-01-01T00:00:00",
+    )
+
+    with pytest.raises(pydantic.ValidationError):
+        chunk.content = "changed"
+    assert ScrapboxChunk.model_validate_json(chunk.model_dump_json()) == chunk
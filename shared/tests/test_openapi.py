@@ -0,0 +1,23 @@
+from shared.models import BulkIndexRequest, EmbeddingRequest
+from shared.openapi import json_request_body
+
+
+def schema_of(model):
+    extra = json_request_body(model)
+    return extra["requestBody"]["content"]["application/json"]["schema"]
+
+
+def test_json_request_body_flat_model():
+    schema = schema_of(EmbeddingRequest)
+
+    assert schema == EmbeddingRequest.model_json_schema()
+
+
+def test_json_request_body_inlines_nested_models():
+    schema = schema_of(BulkIndexRequest)
+
+    assert "$defs" not in schema
+    assert "$ref" not in str(schema)
+    item = schema["properties"]["items"]["items"]
+    assert set(item["properties"]) == {"chunk", "vector"}
+    assert "content" in item["properties"]["chunk"]["properties"]